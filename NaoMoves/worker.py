@@ -0,0 +1,74 @@
+''' Esegue in sequenza le mosse lette da stdin (un solo interprete Python2) '''
+
+# Usage: python2 worker.py <robot_ip> <port>
+#
+# Reads one move name per line from stdin and runs main(robotIP, port)
+# of the corresponding <move>.py script in this folder. After every move
+# it writes a single line on stdout, with the seconds the move took:
+#     done <seconds>
+#     error <seconds> <message>
+# The stdout of the move scripts is discarded, so that stdout only
+# carries these replies; their stderr (and the traceback of a failing
+# move) is left on the worker's stderr. The worker exits when stdin is
+# closed.
+
+import imp
+import os
+import sys
+import time
+import traceback
+
+
+MOVES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_move(move_name, loaded_moves):
+	# Each script is imported only once and then reused
+	if move_name not in loaded_moves:
+		path = os.path.join(MOVES_DIR, move_name + ".py")
+		loaded_moves[move_name] = imp.load_source(move_name, path)
+	return loaded_moves[move_name]
+
+
+def main(robotIP, port):
+	replies = sys.stdout
+	script_output = open(os.devnull, "w")
+	loaded_moves = dict()
+
+	while True:
+		line = sys.stdin.readline()
+		if not line:
+			break  # stdin closed: no more moves
+		move_name = line.strip()
+		if not move_name:
+			continue
+
+		sys.stdout = script_output
+		start_move = time.time()
+		try:
+			load_move(move_name, loaded_moves).main(robotIP, port)
+			reply = "done %.3f" % (time.time() - start_move)
+		except Exception, err:
+			elapsed = time.time() - start_move
+			traceback.print_exc()
+			reply = "error %.3f %s" % (elapsed, err)
+		finally:
+			sys.stdout = replies
+
+		replies.write(reply.replace("\n", " ") + "\n")
+		replies.flush()
+
+
+if __name__ == "__main__":
+	robotIP = "127.0.0.1"
+	port = 9559
+
+	if len(sys.argv) <= 1:
+		sys.stderr.write("(robotIP default: 127.0.0.1)\n")
+	elif len(sys.argv) <= 2:
+		robotIP = sys.argv[1]
+	else:
+		port = int(sys.argv[2])
+		robotIP = sys.argv[1]
+
+	main(robotIP, port)
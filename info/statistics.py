@@ -1,8 +1,8 @@
-def print_solution_statistics(soluzion_state, start_planning, end_planning, total_time):
+def print_solution_statistics(soluzion_state, planning_time, total_time):
     print("\nSTATISTICS:")
-    print(f"Time required by the planning phase: %.2f seconds." % (end_planning-start_planning))
+    print(f"Time required by the planning phase: %.2f seconds." % planning_time)
     #print(f"Entropy of the solution found: {soluzion_state['entropy']}")
-    print(f"Estimated choreography duration: {total_time - soluzion_state['remaining_time']}")
+    print(f"Estimated choreography duration: {total_time - soluzion_state.remaining_time}")
 
 def print_choreography(solution, mandatory_positions):
     print("\nFINAL CHOREOGRAPHY:")
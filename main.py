@@ -3,9 +3,16 @@
 
 import sys
 import time
+import queue
 import random
-from aima.search import astar_search
-from nao_problem import NaoProblem, NaoMove
+import threading
+import itertools
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from nao_problem import (NaoProblem, NaoMove, NaoState,
+                         astar_search_fast, astar_search_numba, branch_and_bound_search,
+                         simulated_annealing_search)
 from utils import *
 from info.statistics import *
 
@@ -16,6 +23,17 @@ MAX_DURATION = 120.0           # Exhibition maximum duration (in seconds)
 LAMBDA_PENALTY = 0.9           # How much we penalize move repetitions
 TIME_TOLERANCE = 2.3           # Accepted leftover time in each step
 MIN_INTERMEDIATE_MOVES = 5     # Global constraint: at least this many intermediate moves
+SEARCH_ALGORITHM = 'branch_and_bound'  # Search used for each step (see SEARCH_ALGORITHMS)
+PARALLEL_PLANNING = False      # Solve the steps in parallel processes first, then fix them up serially
+OVERLAP_PLANNING_AND_EXECUTION = False  # Start dancing while a planner thread plans the later steps
+                                        # (MIN_INTERMEDIATE_MOVES is then only checked after the dance)
+
+SEARCH_ALGORITHMS = {
+    'astar': astar_search_fast,
+    'astar_numba': astar_search_numba,     # Requires numba (otherwise same as 'astar')
+    'branch_and_bound': branch_and_bound_search,
+    'annealing': simulated_annealing_search,   # Not optimal, but bounded time and memory
+}
 
 
 def main(robot_ip, port):
@@ -25,7 +43,8 @@ def main(robot_ip, port):
     The choreography is built by:
       - Fixing a starting position and a list of mandatory positions.
       - Splitting the total available time into steps between consecutive mandatory positions.
-      - For each step, planning a sequence of intermediate moves with A* that:
+      - For each step, planning a sequence of intermediate moves with an
+        optimal search (A* or depth-first branch and bound) that:
           * respects standing/lying constraints;
           * fills almost all the time slot without exceeding it;
           * penalizes repetitions through the cost function.
@@ -99,70 +118,66 @@ def main(robot_ip, port):
     # ----------------------------
     # Planning phase
     # ----------------------------
-    solution = tuple()
-    print("PLANNED CHOREOGRAPHY:")
-    start_planning = time.time()
-
-    for i in range(1, len(pos_list)):
-        # Each step: plan between two mandatory positions
-        starting_pos = pos_list[i - 1]
-        ending_pos = pos_list[i]
-
-        # First move of this step is the mandatory starting pose
-        choreography = (starting_pos[0],)
-
-        initial_standing = postcondition_standing(starting_pos[0])
-        goal_standing = precondition_standing(ending_pos[0])
-
-        # Time slot for this step (only for intermediate moves)
-        remaining_time = remaining_time_per_step
+    # Each step: plan between two consecutive mandatory positions
+    steps = [(pos_list[i - 1][0], pos_list[i][0]) for i in range(1, len(pos_list))]
+    planned_steps = plan_choreography(steps, moves, remaining_time_per_step)
+
+    step_states = []      # final NaoState of each planned step
+    planning_time = 0.0   # time spent planning (also when overlapped with the dance)
+
+    def timed_steps():
+        """Yields the planned steps, adding the time spent planning them to planning_time."""
+        nonlocal planning_time
+        start_step = time.time()
+        for cur_solution_state in planned_steps:
+            planning_time += time.time() - start_step
+            yield cur_solution_state
+            start_step = time.time()
+        planning_time += time.time() - start_step
+
+    def planned_moves(solution_states):
+        """Yields the moves of the whole choreography, step by step."""
+        for cur_solution_state in solution_states:
+            step_states.append(cur_solution_state)
+            yield from cur_solution_state.choreography
+
+        # Add final mandatory position to the overall solution
+        yield final_pos[0]
+
+    if OVERLAP_PLANNING_AND_EXECUTION:
+        # The robot starts dancing as soon as the first step is planned:
+        # a planner thread plans the next steps while the moves are executed
+        # (do_moves waits for the moves in readline(), which releases the GIL).
+        # The choreography is printed and validated after the dance.
+        step_queue = queue.Queue()
+        planner = threading.Thread(target=plan_in_background, args=(timed_steps(), step_queue), daemon=True)
+        planner.start()
+
+        print("DANCE EXEC:")
+        player = play_song("Wii_Sports.mp3")
+        start = time.time()
+        do_moves(planned_moves(queued_steps(step_queue)), robot_ip, port)
+        end = time.time()
+        planner.join()
+        print()
+
+        solution = tuple(
+            move for cur_solution_state in step_states for move in cur_solution_state.choreography
+        ) + (final_pos[0],)
+    else:
+        solution = tuple(planned_moves(timed_steps()))
 
-        # Initial state for this subproblem
-        cur_state = (
-            ('choreography', choreography),
-            ('standing', initial_standing),
-            ('remaining_time', remaining_time),
-        )
-
-        # Goal: correct standing + remaining_time ~ 0
-        cur_goal_state = (
-            ('standing', goal_standing),
-            ('remaining_time', 0.0),
-        )
-
-        # Subproblem: fill the time slot penalizing repetitions
-        step_problem = NaoProblem(
-            init=cur_state,
-            goal=cur_goal_state,
-            moves=moves,
-            previous_moves=solution,
-            lambda_penalty=LAMBDA_PENALTY,
-            time_tolerance=TIME_TOLERANCE,
-        )
-
-        # A* search
-        cur_solution_node = astar_search(step_problem)
-        if cur_solution_node is None:
-            raise RuntimeError(f"Step {i} - no solution was found!")
-
-        cur_solution_dict = from_state_to_dict(cur_solution_node.state)
-        cur_choreography = cur_solution_dict['choreography']
-
-        print(f"Step {i}: \t" + ", ".join(cur_choreography))
-        solution += cur_choreography
-
-    end_planning = time.time()
-
-    # Add final mandatory position to the overall solution
-    solution += (final_pos[0],)
+    print("PLANNED CHOREOGRAPHY:")
+    for i, cur_solution_state in enumerate(step_states, start=1):
+        print(f"Step {i}: \t" + ", ".join(cur_solution_state.choreography))
 
     # Final state of the last subproblem, used for statistics
-    state_dict = from_state_to_dict(cur_solution_node.state)
+    final_state = step_states[-1]
 
     # ----------------------------
     # Global constraint: intermediate moves
     # ----------------------------
-    mandatory_names = [pos_name for pos_name, _ in pos_list]
+    mandatory_names = frozenset(pos_name for pos_name, _ in pos_list)
     intermediate_moves = [m for m in solution if m not in mandatory_names]
 
     # Check that at least MIN_INTERMEDIATE_MOVES intermediate moves are present
@@ -175,20 +190,150 @@ def main(robot_ip, port):
     # ----------------------------
     # Statistics and pretty printing
     # ----------------------------
-    print_solution_statistics(state_dict, start_planning, end_planning, MAX_DURATION)
+    print_solution_statistics(final_state, planning_time, MAX_DURATION)
     print_choreography(solution, mandatory_names)
 
     # ----------------------------
     # Dance execution
     # ----------------------------
-    print("\nDANCE EXEC:")
-    player = play_song("Wii_Sports.mp3")
-    start = time.time()
-    do_moves(solution, robot_ip, port)
-    end = time.time()
+    if not OVERLAP_PLANNING_AND_EXECUTION:
+        print("\nDANCE EXEC:")
+        player = play_song("Wii_Sports.mp3")
+        start = time.time()
+        do_moves(solution, robot_ip, port)
+        end = time.time()
     print("Length of the entire choreography: %.2f seconds." % (end - start))
 
 
+def plan_choreography(steps, moves, remaining_time):
+    """
+    Generator that plans the given steps in order and yields the final
+    NaoState of each one, so callers can use a step as soon as it is planned.
+
+    :param steps: list of (starting_pos_name, ending_pos_name) pairs.
+    :param remaining_time: time slot of each step.
+    """
+    # Only the number of times each move was performed matters for the penalty
+    solution_counts = collections.Counter()
+
+    if PARALLEL_PLANNING:
+        # First pass: solve all steps in parallel, ignoring earlier steps
+        # (each solution is available as soon as it and the earlier ones are ready)
+        parallel_states = plan_steps_in_parallel(steps, moves, remaining_time)
+    else:
+        parallel_states = itertools.repeat(None)
+
+    for i, ((starting_pos_name, ending_pos_name), cur_solution_state) in enumerate(
+        zip(steps, parallel_states), start=1
+    ):
+        # Second pass (or only pass): (re)solve the step with the real history.
+        # A parallel solution that uses no move of the history is still
+        # optimal, because the history only adds penalties to those moves.
+        if cur_solution_state is None or any(
+            solution_counts[move] for move in cur_solution_state.choreography[1:]
+        ):
+            cur_solution_state = plan_step(
+                starting_pos_name, ending_pos_name, moves, solution_counts, remaining_time
+            )
+
+        if cur_solution_state is None:
+            raise RuntimeError(f"Step {i} - no solution was found!")
+
+        solution_counts.update(cur_solution_state.choreography)
+        yield cur_solution_state
+
+
+def plan_step(starting_pos_name, ending_pos_name, moves, previous_moves, remaining_time):
+    """
+    Plan the intermediate moves between two consecutive mandatory positions.
+
+    :param previous_moves: moves performed in earlier steps (penalized), as an
+                           iterable of names or a Counter {name: count}.
+    :param remaining_time: time slot for the intermediate moves.
+    :return: final NaoState of the step, with the choreography translated to
+             move names and starting with the starting position, or None if
+             no solution exists.
+    """
+    # The choreography of the search holds only the intermediate moves
+    cur_state = NaoState(
+        choreography=(),
+        standing=postcondition_standing(starting_pos_name),
+        remaining_time=remaining_time,
+    )
+
+    # Goal: correct standing + remaining_time ~ 0
+    cur_goal_state = NaoState(
+        standing=precondition_standing(ending_pos_name),
+        remaining_time=0.0,
+    )
+
+    # Subproblem: fill the time slot penalizing repetitions
+    step_problem = NaoProblem(
+        init=cur_state,
+        goal=cur_goal_state,
+        moves=moves,
+        previous_moves=previous_moves,
+        lambda_penalty=LAMBDA_PENALTY,
+        time_tolerance=TIME_TOLERANCE,
+    )
+
+    # Optimal search (A* or branch and bound)
+    cur_solution_node = SEARCH_ALGORITHMS[SEARCH_ALGORITHM](step_problem)
+    if cur_solution_node is None:
+        return None
+
+    # First move of this step is the mandatory starting pose
+    cur_solution_state = cur_solution_node.state
+    return cur_solution_state._replace(choreography=(
+        starting_pos_name,
+        *step_problem.move_names(cur_solution_state.choreography),
+    ))
+
+
+def plan_steps_in_parallel(steps, moves, remaining_time):
+    """
+    Solve every step independently (without previous moves) in a pool of
+    processes. Generator that yields the final NaoState of each step, in
+    order, as soon as it is ready.
+    """
+    # 'fork' avoids re-importing this module in every worker (POSIX only)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    else:
+        mp_context = None
+
+    with ProcessPoolExecutor(max_workers=len(steps), mp_context=mp_context) as executor:
+        futures = [
+            executor.submit(plan_step, starting_pos_name, ending_pos_name, moves, (), remaining_time)
+            for starting_pos_name, ending_pos_name in steps
+        ]
+        for future in futures:
+            yield future.result()
+
+
+def plan_in_background(planned_steps, step_queue):
+    """
+    Body of the planner thread: puts every planned step on step_queue as
+    soon as it is ready, then None. If planning fails, the exception is put
+    on the queue instead, so that queued_steps re-raises it.
+    """
+    try:
+        for cur_solution_state in planned_steps:
+            step_queue.put(cur_solution_state)
+    except Exception as e:
+        step_queue.put(e)
+    else:
+        step_queue.put(None)
+
+
+def queued_steps(step_queue):
+    """Yields the steps put on step_queue by plan_in_background, waiting for each one."""
+    for cur_solution_state in iter(step_queue.get, None):
+        if isinstance(cur_solution_state, Exception):
+            raise cur_solution_state
+        yield cur_solution_state
+
+
 def precondition_standing(position):
     """
     Return the required 'standing' value that must hold *before*
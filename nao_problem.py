@@ -1,23 +1,61 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import sys
+import math
+import heapq
 import random
-from aima.search import Problem
-from utils import from_state_to_dict
+import functools
+import itertools
+import collections
+from array import array
+from typing import NamedTuple
+import numpy as np
+from aima.search import Problem, Node
 
 class NaoMove:
     """
     This class describes the information
     of a single move.
     """
+    __slots__ = ('duration', 'preconditions', 'postconditions')
+
     def __init__(self, duration=None, preconditions=None, postconditions=None):
         self.duration = duration
         self.preconditions = preconditions if preconditions is not None else {}
         self.postconditions = postconditions if postconditions is not None else {}
 
+class NaoState(NamedTuple):
+    """
+    This class describes a state of a single
+    planning step (immutable and hashable).
+
+    The choreography is a tuple of move ids (see NaoProblem.move_names),
+    and move_counts[i] is the number of times move id i appears in the
+    global history (the problem's previous_moves + the choreography);
+    move_counts is filled in by NaoProblem and kept up to date
+    incrementally by NaoProblem.result.
+
+    state_hash caches the hash of the state, so that set and dict lookups
+    do not rehash the whole (growing) choreography: NaoProblem computes it
+    for the initial state and result() derives it from the parent's hash
+    and the applied move. Being a field, equal states have equal hashes.
+    """
+    choreography: tuple = ()
+    standing: bool = True
+    remaining_time: float = 0.0
+    move_counts: tuple = ()
+    state_hash: int = None
+
+    def __hash__(self):
+        if self.state_hash is None:
+            return tuple.__hash__(self)
+        return self.state_hash
+
 class NaoProblem(Problem):
     """
-    A* problem where:
+    Search problem for a single step (solved by A*, branch and bound or
+    simulated annealing, see the searches below) where:
     - the cost of each step is: duration + lambda_penalty * f(repetitions)
     - the objective is to consume almost all the available time slot
       (remaining_time → ~0) without exceeding it.
@@ -35,84 +73,141 @@ class NaoProblem(Problem):
             time_tolerance=3.0
         ):
         """
-        :param init: initial state (tuple of pairs ('key', value))
-                     must contain at least:
-                        - 'choreography': tuple(...)
-                        - 'standing': bool
-                        - 'remaining_time': float
-        :param goal: goal state, used only for:
-                        - desired 'remaining_time' (e.g., 0.0)
-                        - final 'standing' value
+        :param init: initial NaoState with:
+                        - choreography: tuple(...) of move ids
+                        - standing: bool
+                        - remaining_time: float
+        :param goal: goal NaoState, used only for:
+                        - desired remaining_time (e.g., 0.0)
+                        - final standing value
         :param moves: dict {move_name: move_object}
                       move_object must have:
                         - duration (float)
                         - preconditions (dict, e.g., {'standing': True})
                         - postconditions (dict, e.g., {'standing': False})
-        :param previous_moves: list of moves performed in earlier steps
+        :param previous_moves: moves performed in earlier steps, as a list of
+                               names or a Counter {name: count}
                                (used to penalize global repetitions).
         :param lambda_penalty: weight of the repetition penalty.
         :param time_tolerance: allowed deviation from the exact time filling.
                                Example: goal.remaining_time = 0, tolerance = 1 → OK if
                                0 <= remaining_time <= 1.
         """
-        super().__init__(init, goal)
         self.available_moves = moves
-        self.previous_moves = list(previous_moves)
+
+        # Parallel arrays indexed by move id (actions are move ids):
+        # standing pre/postconditions are None when the move has none.
+        # Move ids are sorted by increasing duration, so actions() can
+        # stop at the first move that does not fit the remaining time.
+        self._move_names = tuple(
+            sys.intern(move_name)
+            for move_name in sorted(moves, key=lambda move_name: moves[move_name].duration)
+        )
+        sorted_moves = [moves[move_name] for move_name in self._move_names]
+        self._durations = array('d', [move.duration for move in sorted_moves])
+        self._pre_standing = [move.preconditions.get('standing') for move in sorted_moves]
+        self._post_standing = [move.postconditions.get('standing') for move in sorted_moves]
+
+        # Move ids whose standing precondition holds, for each standing value
+        # (still sorted by increasing duration)
+        self._candidate_moves = {
+            standing: tuple(
+                move_id for move_id, pre in enumerate(self._pre_standing) if pre in (None, standing)
+            )
+            for standing in (True, False)
+        }
+
+        # Only how many times each move was performed matters for the penalty
+        self._prev_counts = collections.Counter(previous_moves)
+
+        init = init._replace(
+            move_counts=tuple(
+                self._prev_counts[move_name] + init.choreography.count(move_id)
+                for move_id, move_name in enumerate(self._move_names)
+            ),
+            state_hash=hash((init.choreography, init.standing, init.remaining_time)),
+        )
+        super().__init__(init, goal)
+
         self.lambda_penalty = lambda_penalty
         self.time_tolerance = time_tolerance
 
+        # Shortest move that changes 'standing' from each value, used by h.
+        # It must be applicable in that value (no precondition, or the same one).
+        self._min_flip_duration = {}
+        for standing in (True, False):
+            self._min_flip_duration[standing] = min(
+                (duration
+                 for duration, pre, post in zip(self._durations, self._pre_standing, self._post_standing)
+                 if pre in (None, standing) and post == (not standing)),
+                default=math.inf,
+            )
+
     # ------------------------------------------------------------------
-    # Check if a move is usable
+    # Move ids <-> move names
     # ------------------------------------------------------------------
-    def move_usable(self, state, move_name, move):
-        state_dict = from_state_to_dict(state)
+    def move_names(self, move_ids):
+        """Return the names of the given move ids (e.g., a choreography)."""
+        return tuple(self._move_names[move_id] for move_id in move_ids)
 
+    # ------------------------------------------------------------------
+    # Check if a move is usable
+    # ------------------------------------------------------------------
+    def move_usable(self, state, move_id):
         # 1) Cannot exceed the time slot
-        if state_dict['remaining_time'] < move.duration:
+        if state.remaining_time < self._durations[move_id]:
             return False
 
         # 2) Logical preconditions (e.g., standing / sitting)
-        if 'standing' in move.preconditions:
-            if state_dict['standing'] != move.preconditions['standing']:
-                return False
+        pre_standing = self._pre_standing[move_id]
+        if pre_standing is not None and state.standing != pre_standing:
+            return False
 
         # 3) Hard constraint: avoid repeating the same move twice in a row
-        choreography = state_dict['choreography']
+        choreography = state.choreography
         if choreography:
-            if move_name == choreography[-1]:
+            if move_id == choreography[-1]:
                 return False
 
         return True
 
     # ------------------------------------------------------------------
-    # actions: list of possible moves
+    # actions: list of possible moves (move ids)
     # ------------------------------------------------------------------
     def actions(self, state):
+        # Same checks as move_usable, in bulk: the standing preconditions
+        # are already applied by _candidate_moves, then the time slot and
+        # the no-repetition constraint are checked.
         usable_actions = []
-        for move_name, move in self.available_moves.items():
-            if self.move_usable(state, move_name, move):
-                usable_actions.append(move_name)
-        random.shuffle(usable_actions)
+        remaining_time = state.remaining_time
+        durations = self._durations
+        last_move_id = state.choreography[-1] if state.choreography else None
+        for move_id in self._candidate_moves[state.standing]:
+            if durations[move_id] > remaining_time:
+                break  # every following move is at least as long
+            if move_id != last_move_id:
+                usable_actions.append(move_id)
         return usable_actions
 
     # ------------------------------------------------------------------
     # result: next state after applying a move
     # ------------------------------------------------------------------
     def result(self, state, action):
-        nao_move = self.available_moves[action]
-        state_dict = from_state_to_dict(state)
-
         # Determine new 'standing' value
-        if 'standing' in nao_move.postconditions:
-            new_standing = nao_move.postconditions['standing']
-        else:
-            new_standing = state_dict['standing']
+        new_standing = self._post_standing[action]
+        if new_standing is None:
+            new_standing = state.standing
+
+        new_remaining_time = state.remaining_time - self._durations[action]
 
-        new_remaining_time = state_dict['remaining_time'] - nao_move.duration
+        new_move_counts = list(state.move_counts)
+        new_move_counts[action] += 1
 
-        return (('choreography', (*state_dict['choreography'], action)),
-                ('standing', new_standing),
-                ('remaining_time', new_remaining_time))
+        return NaoState((*state.choreography, action),
+                        new_standing,
+                        new_remaining_time,
+                        tuple(new_move_counts),
+                        hash((state.state_hash, action)))
 
     # ------------------------------------------------------------------
     # path_cost: duration + penalty on GLOBAL repetitions
@@ -120,7 +215,7 @@ class NaoProblem(Problem):
     def path_cost(self, c, state1, action, state2):
         """
         c = cost accumulated so far
-        state1 -> state2 via 'action'
+        state1 -> state2 via 'action' (a move id)
 
         action cost = duration + lambda_penalty * (count ** 2)
 
@@ -129,15 +224,10 @@ class NaoProblem(Problem):
           - count = number of times 'action' already appeared in the global
                     choreography (previous_moves + current choreography).
         """
-        nao_move = self.available_moves[action]
-        duration = nao_move.duration
-
-        s1_dict = from_state_to_dict(state1)
+        duration = self._durations[action]
 
-        # All moves performed so far (previous steps + current choreography)
-        history = self.previous_moves + list(s1_dict['choreography'])
-
-        count = history.count(action)
+        # Occurrences among all moves performed so far (previous steps + current choreography)
+        count = state1.move_counts[action]
 
         # Quadratic penalty for stronger discouragement of repetitions
         penalty = self.lambda_penalty * (count ** 2)
@@ -149,18 +239,15 @@ class NaoProblem(Problem):
     #            and reached the desired final standing
     # ------------------------------------------------------------------
     def goal_test(self, state):
-        state_dict = from_state_to_dict(state)
-        goal_dict = from_state_to_dict(self.goal)
-
-        goal_remaining_time = goal_dict['remaining_time']  # usually 0.0
+        goal_remaining_time = self.goal.remaining_time  # usually 0.0
         a = goal_remaining_time
         b = goal_remaining_time + self.time_tolerance
 
         # 1) remaining_time must be within the desired range
-        time_constraint = (a <= state_dict['remaining_time'] <= b)
+        time_constraint = (a <= state.remaining_time <= b)
 
         # 2) final standing must match the goal
-        standing_constraint = (state_dict['standing'] == goal_dict['standing'])
+        standing_constraint = (state.standing == self.goal.standing)
 
         return time_constraint and standing_constraint
 
@@ -180,15 +267,461 @@ class NaoProblem(Problem):
 
         h = max(0, R - (R_goal + tol))
 
+        Moreover, if the current 'standing' differs from the goal one, at
+        least one move that flips it must still be performed, so h is at
+        least the shortest such move. Nodes that cannot reach the goal
+        (no move fits the time that can still be spent, or no flipping move
+        fits) get h = +inf, so the search prunes them.
+
         - This is a lower bound on the time we will still spend.
         - It ignores repetition penalties, so it does NOT overestimate.
         - It is consistent (satisfies the triangle inequality).
         """
-        state_dict = from_state_to_dict(node.state)
-        goal_dict = from_state_to_dict(self.goal)
-
-        R = state_dict['remaining_time']
-        R_goal = goal_dict['remaining_time']
+        state = node.state
+        R = state.remaining_time
+        R_goal = self.goal.remaining_time
         tol = self.time_tolerance
 
-        return max(0.0, R - (R_goal + tol))
+        # Time that can still be spent without going below R_goal
+        available = R - R_goal
+
+        h = max(0.0, R - (R_goal + tol))
+        if h > 0.0 and self._durations[0] > available:
+            return math.inf  # time must be burnt, but no move fits
+
+        if state.standing != self.goal.standing:
+            min_flip_duration = self._min_flip_duration[state.standing]
+            if min_flip_duration > available:
+                return math.inf  # the final standing cannot be reached
+            h = max(h, min_flip_duration)
+
+        return h
+
+
+def astar_search_fast(problem, h=None):
+    """
+    A* graph search on a plain binary heap of (f, counter, node) entries.
+
+    The counter breaks ties between equal f values (first generated, first
+    expanded), so nodes and states are never compared. best_g keeps the
+    cheapest path cost found for each state: when a cheaper path is found
+    the new node is simply pushed, and the outdated entry is skipped when
+    it is popped, instead of being searched and removed from the frontier.
+
+    Returns the goal node, or None if there is no solution.
+    """
+    h = h or problem.h
+    counter = itertools.count()
+
+    node = Node(problem.initial)
+    frontier = [(node.path_cost + h(node), next(counter), node)]
+    best_g = {node.state: node.path_cost}
+    explored = set()
+
+    while frontier:
+        _, _, node = heapq.heappop(frontier)
+        if node.state in explored or node.path_cost > best_g[node.state]:
+            continue  # outdated entry
+        if problem.goal_test(node.state):
+            return node
+        explored.add(node.state)
+
+        for child in node.expand(problem):
+            if child.state in explored:
+                continue
+            g = best_g.get(child.state)
+            if g is None or child.path_cost < g:
+                f = child.path_cost + h(child)
+                if f == math.inf:
+                    continue  # dead end: the goal cannot be reached
+                best_g[child.state] = child.path_cost
+                heapq.heappush(frontier, (f, next(counter), child))
+
+    return None
+
+
+def branch_and_bound_search(problem, h=None):
+    """
+    Depth-first branch and bound.
+
+    The search tree is explored depth-first (cheapest f = g + h child
+    first), keeping the cheapest goal node found so far and pruning every
+    node whose f cannot improve on it. With an admissible heuristic the
+    returned node is optimal, as with A*, but only the current path is kept
+    in memory instead of the whole frontier.
+
+    Returns the goal node, or None if there is no solution.
+    """
+    h = h or problem.h
+    best_node = None
+    best_cost = math.inf
+
+    def explore(node):
+        nonlocal best_node, best_cost
+        if problem.goal_test(node.state):
+            if node.path_cost < best_cost:
+                best_node, best_cost = node, node.path_cost
+            return
+
+        # A node without usable moves (e.g., remaining_time shorter than
+        # any move) is a dead end: the loop below simply does nothing.
+        children = [(child.path_cost + h(child), child) for child in node.expand(problem)]
+        children.sort(key=lambda f_child: f_child[0])
+        for f, child in children:
+            if f >= best_cost:
+                break  # children are sorted: no other one can improve
+            explore(child)
+
+    explore(Node(problem.initial))
+    return best_node
+
+
+VIOLATION_WEIGHT = 1000.0  # Energy of a broken constraint in simulated_annealing_search
+
+
+def simulated_annealing_search(problem, iterations=5000, start_temperature=10.0,
+                               end_temperature=0.01, tabu_size=50, seed=None):
+    """
+    Simulated annealing over the sequences of moves of a NaoProblem.
+
+    Unlike aima's simulated_annealing (which walks the states of the
+    problem), a candidate solution here is a whole sequence of move ids:
+    - it starts from a greedy time fill (depth-first on the move with the
+      lowest f = g + h, stopping at the first goal reached);
+    - a neighbour swaps two adjacent moves, replaces a move with one of
+      similar duration, or inserts / removes a move;
+    - its energy is the path cost plus VIOLATION_WEIGHT for every broken
+      constraint (unusable move, time outside the goal interval, wrong
+      final standing) and for every second outside the goal interval;
+    - worse neighbours are accepted with probability exp(-delta / T), with
+      T cooling geometrically from start_temperature to end_temperature;
+    - the last tabu_size candidates are tabu, to avoid cycling.
+
+    The result is not guaranteed to be optimal, but the work and the memory
+    are bounded by the number of iterations.
+
+    Returns the goal node of the best valid sequence found, or None.
+    """
+    rng = random.Random(seed)
+    n_moves = len(problem._move_names)
+    durations = problem._durations
+    goal_low = problem.goal.remaining_time
+    goal_high = goal_low + problem.time_tolerance
+
+    def energy(sequence):
+        """Return (energy, valid) of a sequence of move ids."""
+        state = problem.initial
+        cost = 0.0
+        violations = 0
+        for move_id in sequence:
+            if not problem.move_usable(state, move_id):
+                violations += 1
+            next_state = problem.result(state, move_id)
+            cost = problem.path_cost(cost, state, move_id, next_state)
+            state = next_state
+
+        time_error = max(0.0, goal_low - state.remaining_time, state.remaining_time - goal_high)
+        if time_error > 0.0:
+            violations += 1
+        if state.standing != problem.goal.standing:
+            violations += 1
+        return cost + VIOLATION_WEIGHT * (violations + time_error), violations == 0
+
+    def neighbour(sequence):
+        sequence = list(sequence)
+        operator = rng.randrange(4)
+        if operator == 0 and len(sequence) >= 2:
+            # Swap two adjacent moves
+            i = rng.randrange(len(sequence) - 1)
+            sequence[i], sequence[i + 1] = sequence[i + 1], sequence[i]
+        elif operator == 1 and sequence:
+            # Replace a move with one of similar duration (ids are sorted by duration)
+            i = rng.randrange(len(sequence))
+            sequence[i] = min(n_moves - 1, max(0, sequence[i] + rng.choice((-2, -1, 1, 2))))
+        elif operator == 2 or not sequence:
+            # Insert a move, if the time budget permits
+            move_id = rng.randrange(n_moves)
+            spent = sum(durations[m] for m in sequence)
+            if spent + durations[move_id] <= problem.initial.remaining_time - goal_low:
+                sequence.insert(rng.randint(0, len(sequence)), move_id)
+        else:
+            # Remove a move
+            del sequence[rng.randrange(len(sequence))]
+        return tuple(sequence)
+
+    # Greedy initial solution: depth-first, lowest f = g + h child first,
+    # stopping at the first goal (at most 'iterations' expansions)
+    expansions = 0
+
+    def greedy_fill(node):
+        nonlocal expansions
+        if problem.goal_test(node.state):
+            return node
+        if expansions >= iterations:
+            return None
+        expansions += 1
+        children = [(child.path_cost + problem.h(child), child) for child in node.expand(problem)]
+        children.sort(key=lambda f_child: f_child[0])
+        for f, child in children:
+            if f == math.inf:
+                break  # dead ends only
+            goal_node = greedy_fill(child)
+            if goal_node is not None:
+                return goal_node
+        return None
+
+    greedy_node = greedy_fill(Node(problem.initial))
+    current = tuple(greedy_node.solution()) if greedy_node is not None else ()
+
+    current_energy, valid = energy(current)
+    best = current if valid else None
+    best_energy = current_energy if valid else math.inf
+
+    tabu = collections.deque([current], maxlen=tabu_size)
+    cooling = (end_temperature / start_temperature) ** (1.0 / iterations)
+    temperature = start_temperature
+    for _ in range(iterations):
+        temperature *= cooling
+        candidate = neighbour(current)
+        if candidate in tabu:
+            continue
+
+        candidate_energy, valid = energy(candidate)
+        delta = candidate_energy - current_energy
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            current, current_energy = candidate, candidate_energy
+            tabu.append(current)
+            if valid and current_energy < best_energy:
+                best, best_energy = current, current_energy
+
+    if best is None:
+        return None
+
+    # Rebuild the aima nodes (and states) along the best sequence
+    node = Node(problem.initial)
+    for move_id in best:
+        node = node.child_node(problem, move_id)
+    return node
+
+
+# ______________________________________________________________________________
+# A* compiled with Numba
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled_astar_kernel():
+    """
+    Wraps the kernels below with Numba on the first call, so that Numba is
+    only imported when astar_search_numba is used.
+
+    Returns the compiled _astar_kernel, or None if Numba is not installed.
+    """
+    try:
+        from numba import njit
+    except ImportError:  # Numba is optional: astar_search_numba falls back to astar_search_fast
+        return None
+
+    # _astar_kernel calls the helpers through the module globals,
+    # which must refer to the compiled versions when it is compiled
+    module_globals = globals()
+    for name in ('_h_kernel', '_heap_less'):
+        module_globals[name] = njit(cache=True)(module_globals[name])
+    return njit(cache=True)(_astar_kernel)
+
+
+def _h_kernel(standing, remaining_time, durations, min_flip_duration,
+              goal_remaining_time, goal_standing, time_tolerance):
+    """Same heuristic as NaoProblem.h, on plain values."""
+    available = remaining_time - goal_remaining_time
+
+    h = max(0.0, remaining_time - (goal_remaining_time + time_tolerance))
+    if h > 0.0 and durations[0] > available:
+        return np.inf
+
+    if standing != goal_standing:
+        flip_duration = min_flip_duration[1 if standing else 0]
+        if flip_duration > available:
+            return np.inf
+        h = max(h, flip_duration)
+
+    return h
+
+
+def _heap_less(node_a, node_b, node_f):
+    # Ties on f are broken by node id, i.e., by generation order
+    return node_f[node_a] < node_f[node_b] or (node_f[node_a] == node_f[node_b] and node_a < node_b)
+
+
+def _astar_kernel(durations, pre_standing, post_standing, min_flip_duration, move_counts,
+                  last_move_id, standing, remaining_time,
+                  goal_remaining_time, goal_standing, time_tolerance, lambda_penalty):
+    """
+    A* over flat arrays. Moves are sorted by increasing duration, and their
+    standing pre/postconditions are -1 (none), 0 (False) or 1 (True).
+
+    Every state holds its whole choreography, so no state can be reached by
+    two paths: the search tree is stored as arrays of nodes (parent, move,
+    standing, remaining time, g, f) and no explored set is needed. The
+    repetition count of a move is its count in move_counts (history before
+    the search) plus its occurrences along the path to the root.
+
+    Returns the move ids from the initial state to the goal, or None.
+    """
+    n_moves = durations.shape[0]
+    capacity = 1024
+    parent = np.empty(capacity, np.int64)
+    move = np.empty(capacity, np.int64)
+    node_standing = np.empty(capacity, np.bool_)
+    node_remaining = np.empty(capacity, np.float64)
+    node_g = np.empty(capacity, np.float64)
+    node_f = np.empty(capacity, np.float64)
+    heap = np.empty(capacity, np.int64)
+
+    # Root node (its move is the last move of the initial choreography)
+    parent[0] = -1
+    move[0] = last_move_id
+    node_standing[0] = standing
+    node_remaining[0] = remaining_time
+    node_g[0] = 0.0
+    node_f[0] = _h_kernel(standing, remaining_time, durations, min_flip_duration,
+                          goal_remaining_time, goal_standing, time_tolerance)
+    n_nodes = 1
+    heap[0] = 0
+    heap_size = 1
+
+    while heap_size > 0:
+        # Pop the node with the lowest f
+        node = heap[0]
+        heap_size -= 1
+        heap[0] = heap[heap_size]
+        i = 0
+        while True:
+            smallest = i
+            for child_pos in (2 * i + 1, 2 * i + 2):
+                if child_pos < heap_size and _heap_less(heap[child_pos], heap[smallest], node_f):
+                    smallest = child_pos
+            if smallest == i:
+                break
+            heap[i], heap[smallest] = heap[smallest], heap[i]
+            i = smallest
+
+        cur_standing = node_standing[node]
+        cur_remaining = node_remaining[node]
+
+        # Goal test
+        if (goal_remaining_time <= cur_remaining <= goal_remaining_time + time_tolerance
+                and cur_standing == goal_standing):
+            depth = 0
+            k = node
+            while k != 0:
+                depth += 1
+                k = parent[k]
+            path = np.empty(depth, np.int64)
+            k = node
+            while k != 0:
+                depth -= 1
+                path[depth] = move[k]
+                k = parent[k]
+            return path
+
+        # Expansion
+        if n_nodes + n_moves > capacity:
+            capacity *= 2
+            parent = np.concatenate((parent, np.empty(capacity - parent.shape[0], np.int64)))
+            move = np.concatenate((move, np.empty(capacity - move.shape[0], np.int64)))
+            node_standing = np.concatenate(
+                (node_standing, np.empty(capacity - node_standing.shape[0], np.bool_)))
+            node_remaining = np.concatenate(
+                (node_remaining, np.empty(capacity - node_remaining.shape[0], np.float64)))
+            node_g = np.concatenate((node_g, np.empty(capacity - node_g.shape[0], np.float64)))
+            node_f = np.concatenate((node_f, np.empty(capacity - node_f.shape[0], np.float64)))
+            heap = np.concatenate((heap, np.empty(capacity - heap.shape[0], np.int64)))
+
+        for move_id in range(n_moves):
+            duration = durations[move_id]
+            if duration > cur_remaining:
+                break  # every following move is at least as long
+            pre = pre_standing[move_id]
+            if pre >= 0 and (pre == 1) != cur_standing:
+                continue
+            if move_id == move[node]:
+                continue  # no repetition twice in a row
+
+            count = move_counts[move_id]
+            k = node
+            while k != 0:
+                if move[k] == move_id:
+                    count += 1
+                k = parent[k]
+
+            post = post_standing[move_id]
+            new_standing = cur_standing if post < 0 else post == 1
+            new_remaining = cur_remaining - duration
+            h = _h_kernel(new_standing, new_remaining, durations, min_flip_duration,
+                          goal_remaining_time, goal_standing, time_tolerance)
+            if h == np.inf:
+                continue  # dead end: the goal cannot be reached
+
+            child = n_nodes
+            n_nodes += 1
+            parent[child] = node
+            move[child] = move_id
+            node_standing[child] = new_standing
+            node_remaining[child] = new_remaining
+            node_g[child] = node_g[node] + duration + lambda_penalty * (count ** 2)
+            node_f[child] = node_g[child] + h
+
+            # Push the child
+            i = heap_size
+            heap[i] = child
+            heap_size += 1
+            while i > 0:
+                parent_pos = (i - 1) // 2
+                if not _heap_less(heap[i], heap[parent_pos], node_f):
+                    break
+                heap[i], heap[parent_pos] = heap[parent_pos], heap[i]
+                i = parent_pos
+
+    return None
+
+
+def astar_search_numba(problem, h=None):
+    """
+    A* for a NaoProblem, run by the Numba-compiled _astar_kernel.
+
+    It expands nodes in the same order as astar_search_fast, but outside
+    the Python interpreter. The kernel implements NaoProblem.h: with a
+    custom h, or when Numba is not installed, astar_search_fast is used.
+
+    Returns the goal node, or None if there is no solution.
+    """
+    astar_kernel = _compiled_astar_kernel() if h is None else None
+    if astar_kernel is None:
+        return astar_search_fast(problem, h)
+
+    def encode(standing_values):
+        return np.array([-1 if value is None else int(value) for value in standing_values], np.int64)
+
+    initial = problem.initial
+    path = astar_kernel(
+        np.array(problem._durations, np.float64),
+        encode(problem._pre_standing),
+        encode(problem._post_standing),
+        np.array([problem._min_flip_duration[False], problem._min_flip_duration[True]], np.float64),
+        np.array(initial.move_counts, np.int64),
+        initial.choreography[-1] if initial.choreography else -1,
+        initial.standing,
+        initial.remaining_time,
+        problem.goal.remaining_time,
+        problem.goal.standing,
+        problem.time_tolerance,
+        problem.lambda_penalty,
+    )
+    if path is None:
+        return None
+
+    # Rebuild the aima nodes (and states) along the solution
+    node = Node(initial)
+    for move_id in path:
+        node = node.child_node(problem, int(move_id))
+    return node
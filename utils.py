@@ -1,15 +1,45 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import atexit
+import shutil
 import subprocess
-import time
-import vlc
 
 def play_song(song_name):
     """
-    Tries to play an audio file using VLC.
+    Tries to play an audio file in the background.
+
+    The lightest available backend is used:
+    - simpleaudio (WAV files only),
+    - ffplay (from FFmpeg), run as a child process,
+    - VLC (python-vlc), as a last resort.
+
+    Returns the player (PlayObject, Popen or MediaPlayer) so the caller can
+    keep it alive, or None if the song cannot be played.
     """
+    if song_name.lower().endswith(".wav"):
+        try:
+            import simpleaudio
+            return simpleaudio.WaveObject.from_wave_file(song_name).play()
+        except Exception as e:
+            print(f"[WARN] simpleaudio could not play '{song_name}': {e}")
+
+    ffplay = shutil.which("ffplay")
+    if ffplay is not None:
+        try:
+            player = subprocess.Popen(
+                [ffplay, "-nodisp", "-autoexit", "-loglevel", "quiet", song_name],
+                stdin=subprocess.DEVNULL,   # ffplay would otherwise read the keyboard
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            atexit.register(player.terminate)   # the song stops with the program
+            return player
+        except OSError as e:
+            print(f"[WARN] ffplay could not play '{song_name}': {e}")
+
     try:
+        import vlc
         player = vlc.MediaPlayer(song_name)
         player.play()
         return player   # <-- important: return the player so caller can keep it alive
@@ -20,57 +50,58 @@ def play_song(song_name):
 
 def do_moves(moves, robot_ip, robot_port):
     """
-    Executes a list of NAO robot movements.
+    Executes a sequence of NAO robot movements.
     
     Each movement corresponds to a Python2 script located in ./NaoMoves/,
-    named <move>.py.
-    
-    For every move:
-    - builds the Python2 command
-    - measures execution time
-    - prints how long the move took to run
-    """
-    for move in moves:
-        print(f"Executing: {move}... ", end="", flush=True)
-        python2_command = f"python2 ./NaoMoves/{move}.py {robot_ip} {robot_port}"
-        start_move = time.time()
-        # subprocess.run executes the command and returns stdout
-        process = subprocess.run(python2_command.split(), stdout=subprocess.PIPE)
-        end_move = time.time()
-        # print(process.stdout)  # Uncomment to see the output of the Python2 script
-        print("done in %.2f seconds." % (end_move - start_move), flush=True)
-
+    named <move>.py. All the moves are run by a single, long-lived Python2
+    process (./NaoMoves/worker.py), so the interpreter start-up and the
+    NAOqi imports are paid only once instead of once per move.
 
-def from_state_to_dict(state):
-    """
-    Converts a state (list of tuples) into a dictionary {key: value}.
-    
-    Each element in 'state' is a tuple:
-        (key, value)            -> maps to key: value
-        (key, v1, v2, ...)      -> maps to key: (v1, v2, ...)
+    'moves' can be any iterable, also a lazy one (e.g., a generator that
+    plans the choreography while it is consumed): the next move is
+    requested while the current one is running, so producing it overlaps
+    with the execution. Moves are still executed one at a time.
     
-    The function:
-    - ignores tuples that are too short
-    - assigns either a single value or a group of values
-    - does not overwrite existing keys in the dictionary
+    For every move:
+    - sends its name to the worker and waits for its reply
+    - prints how long the move took to run, as measured by the worker
+      (so the time spent producing the next move is not counted)
     """
-    params_dict = dict()
-
-    for t in state:
-        len_t = len(t)
-        if len_t < 2:
-            continue  # Invalid tuple, skip it
-
-        key = t[0]
-
-        # If the tuple contains more than 2 elements, store all remaining values
-        if len_t > 2:
-            value = t[1:]
-        else:
-            value = t[1]
-
-        # Only add the key if it is not already present
-        if key not in params_dict:
-            params_dict[key] = value
+    # Full path of the interpreter: subprocess uses posix_spawn() instead of
+    # fork()+exec() only if the executable has a directory component
+    python2 = shutil.which("python2") or "python2"
+    python2_command = [python2, "./NaoMoves/worker.py", str(robot_ip), str(robot_port)]
+    # The worker reads one move name per line and answers
+    # 'done <seconds>' or 'error <seconds> <message>'
+    worker = subprocess.Popen(
+        python2_command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=None,  # Errors (and tracebacks) of the Python2 scripts go to the terminal
+        text=True,
+        bufsize=1,
+        close_fds=False,  # Also needed by posix_spawn(); our fds are non-inheritable anyway (PEP 446)
+    )
+    try:
+        moves = iter(moves)
+        move = next(moves, None)
+        while move is not None:
+            print(f"Executing: {move}... ", end="", flush=True)
+            worker.stdin.write(move + "\n")
+            worker.stdin.flush()
+            try:
+                # Fetch (possibly plan) the next move while this one is running
+                move = next(moves, None)
+            finally:
+                reply = worker.stdout.readline().strip().split(maxsplit=2)
+            if not reply:
+                print("failed (worker exited).", flush=True)
+            elif reply[0] == "done":
+                print("done in %.2f seconds." % float(reply[1]), flush=True)
+            else:
+                print("failed after %.2f seconds (%s)." % (float(reply[1]), " ".join(reply[2:])),
+                      flush=True)
+    finally:
+        worker.stdin.close()
+        worker.wait()
 
-    return params_dict